@@ -67,6 +67,13 @@ _C.TRAIN.CHECKPOINT_TYPE = "pytorch"
 # If True, perform inflation when loading checkpoint.
 _C.TRAIN.CHECKPOINT_INFLATE = False
 
+# If True, run the forward pass in mixed precision and scale the loss.
+_C.TRAIN.MIXED_PRECISION = False
+
+# Number of iterations whose gradients are accumulated before each parameter
+# update. The effective batch size is BATCH_SIZE * ACCUM_STEPS.
+_C.TRAIN.ACCUM_STEPS = 1
+
 # ---------------------------------------------------------------------------- #
 # Testing options
 # ---------------------------------------------------------------------------- #
@@ -189,8 +196,20 @@ _C.MODEL.DROPOUT_RATE = 0.5
 # The std to initialize the fc layer(s).
 _C.MODEL.FC_INIT_STD = 0.01
 
+# If True, store the model weights and the input clips in the channels last
+# (NDHWC) memory format.
+_C.MODEL.CHANNELS_LAST = False
+
 _C.MODEL.LSTM = False
 
+# Hidden size of the history LSTM. It must match the pretrained LSTM
+# checkpoint; multiples of 8 let mixed precision use Tensor Cores.
+_C.MODEL.LSTM_HIDDEN_SIZE = 20
+
+# Implementation of the history LSTM, includes `eager` (`nn.LSTM`) and `fused`
+# (scripted LSTM layers with fused pointwise operations).
+_C.MODEL.LSTM_BACKEND = "eager"
+
 # -----------------------------------------------------------------------------
 # Slowfast options
 # -----------------------------------------------------------------------------
@@ -328,6 +347,9 @@ _C.LOG_PERIOD = 10
 # Distributed backend.
 _C.DIST_BACKEND = "nccl"
 
+# Size in MB of the buckets used to all-reduce the gradients across processes.
+_C.DIST_BUCKET_CAP_MB = 25
+
 
 # ---------------------------------------------------------------------------- #
 # Common train/test data loader options
@@ -340,6 +362,12 @@ _C.DATA_LOADER.NUM_WORKERS = 8
 # Load data to pinned host memory.
 _C.DATA_LOADER.PIN_MEMORY = True
 
+# Keep the data loader workers alive between epochs.
+_C.DATA_LOADER.PERSISTENT_WORKERS = True
+
+# Number of batches loaded in advance by each worker.
+_C.DATA_LOADER.PREFETCH_FACTOR = 4
+
 # Enable multi thread decoding.
 _C.DATA_LOADER.ENABLE_MULTI_THREAD_DECODE = False
 
@@ -459,25 +487,37 @@ _C.EPICKITCHENS.TRAIN_PLUS_VAL = False
 
 _C.EPICKITCHENS.TB_DIR = ""
 
+# If not empty, the frozen features of the training clips are computed once,
+# stored in this directory and used instead of the frames to train the
+# prediction layer of the LSTM model. Each clip is cached from a single random
+# temporal and spatial sample, so this turns off the data augmentation for the
+# whole run. A cache built from other checkpoints or data options is rejected;
+# remove the directory to rebuild it.
+_C.EPICKITCHENS.FEATURE_CACHE_DIR = ""
 
-def _assert_and_infer_cfg(cfg):
+
+def assert_and_infer_cfg(cfg):
     # BN assertions.
     if cfg.BN.USE_PRECISE_STATS:
         assert cfg.BN.NUM_BATCHES_PRECISE >= 0
     # TRAIN assertions.
     assert cfg.TRAIN.CHECKPOINT_TYPE in ["pytorch", "caffe2"]
     assert cfg.TRAIN.BATCH_SIZE % cfg.NUM_GPUS == 0
+    assert cfg.TRAIN.ACCUM_STEPS >= 1
 
     # TEST assertions.
     assert cfg.TEST.CHECKPOINT_TYPE in ["pytorch", "caffe2"]
     assert cfg.TEST.BATCH_SIZE % cfg.NUM_GPUS == 0
-    assert cfg.TEST.NUM_SPATIAL_CROPS == 3
+    assert cfg.TEST.NUM_SPATIAL_CROPS in [1, 3]
 
     # RESNET assertions.
     assert cfg.RESNET.NUM_GROUPS > 0
     assert cfg.RESNET.WIDTH_PER_GROUP > 0
     assert cfg.RESNET.WIDTH_PER_GROUP % cfg.RESNET.NUM_GROUPS == 0
 
+    # MODEL assertions.
+    assert cfg.MODEL.LSTM_BACKEND in ["eager", "fused"]
+
     # General assertions.
     assert cfg.SHARD_ID < cfg.NUM_SHARDS
     return cfg
@@ -487,4 +527,4 @@ def get_cfg():
     """
     Get a copy of the default config.
     """
-    return _assert_and_infer_cfg(_C.clone())
+    return assert_and_infer_cfg(_C.clone())
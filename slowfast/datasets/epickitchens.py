@@ -1,6 +1,6 @@
 import os
 
-import functools
+import numpy as np
 import pandas as pd
 import torch
 import torch.utils.data
@@ -31,6 +31,8 @@ class Epickitchens(torch.utils.data.Dataset):
         self.cfg = cfg
         self.mode = mode
         self.target_fps = 60
+        # If True, return the cached frozen features of a clip instead of its frames.
+        self.cached_features = False
         # For training or validation mode, one single clip is sampled from every
         # video. For testing, NUM_ENSEMBLE_VIEWS clips are sampled from every
         # video. For every clip, NUM_SPATIAL_CROPS is cropped spatially from
@@ -64,27 +66,27 @@ class Epickitchens(torch.utils.data.Dataset):
                 file
             )
 
-        self._video_records = []
-        self._spatial_temporal_idx = []
-        for file in path_annotations_pickle:
-            for tup in pd.read_pickle(file).iterrows():
-                for idx in range(self._num_clips):
-                    self._video_records.append(EpicKitchensVideoRecord(tup))
-                    self._spatial_temporal_idx.append(idx)
-        def compare(record_a: EpicKitchensVideoRecord, record_b: EpicKitchensVideoRecord):
-            if record_a.untrimmed_video_name < record_b.untrimmed_video_name:
-                return -1
-            elif record_a.untrimmed_video_name > record_b.untrimmed_video_name:
-                return 1
-            else:
-                if record_a.start_frame < record_b.start_frame:
-                    return -1
-                elif record_a.start_frame > record_b.start_frame:
-                    return 1
-                else:
-                    return 0
-
-        self._video_records.sort(key=functools.cmp_to_key(compare))
+        annotations = pd.concat([pd.read_pickle(file) for file in path_annotations_pickle])
+        # Every annotation is repeated once per clip, then ordered by untrimmed
+        # video and start frame. lexsort is stable, so the clips of an
+        # annotation stay contiguous and in order.
+        clip_row = np.repeat(np.arange(len(annotations)), self._num_clips)
+        clip_idx = np.tile(np.arange(self._num_clips), len(annotations))
+        video_ids = annotations['video_id'].to_numpy().astype(str)[clip_row]
+        start_frames = annotations['start_frame'].to_numpy()[clip_row]
+        order = np.lexsort((start_frames, video_ids))
+        annotations = annotations.iloc[clip_row[order]]
+
+        # Store the annotations column-wise; the records are views into them.
+        self._col = {
+            name: annotations[name].to_numpy()
+            for name in ('participant_id', 'start_frame', 'stop_frame', 'verb_class', 'noun_class')
+            if name in annotations
+        }
+        self._col['video_id'] = video_ids[order]
+        self._col['narration_id'] = annotations.index.to_numpy().astype(str)
+        self._video_records = [EpicKitchensVideoRecord(self, idx) for idx in range(len(annotations))]
+        self._spatial_temporal_idx = clip_idx[order].tolist()
         assert (
                 len(self._video_records) > 0
         ), "Failed to load EPIC-KITCHENS split {} from {}".format(
@@ -95,6 +97,26 @@ class Epickitchens(torch.utils.data.Dataset):
                 len(self._video_records), path_annotations_pickle
             )
         )
+        self._construct_label_luts()
+
+    def _construct_label_luts(self):
+        """
+        Precompute per-record lookup tables used to gather the history labels
+        of a clip with tensor ops instead of walking the records in Python.
+        """
+        num_records = len(self._video_records)
+        for name, column in (('_verb_lut', 'verb_class'), ('_noun_lut', 'noun_class')):
+            if column in self._col:
+                lut = torch.from_numpy(self._col[column].astype(np.int64))
+            else:
+                lut = torch.full((num_records,), -1, dtype=torch.long)
+            setattr(self, name, lut)
+        # Records of the same untrimmed video are contiguous, so every record
+        # only needs the index of the first record of its video.
+        _, video_starts, video_lut = np.unique(
+            self._col['video_id'], return_index=True, return_inverse=True
+        )
+        self._video_start_lut = torch.from_numpy(video_starts[video_lut].astype(np.int64))
 
     def __getitem__(self, index):
         """
@@ -111,6 +133,34 @@ class Epickitchens(torch.utils.data.Dataset):
                 decoded, then return the index of the video. If not, return the
                 index of the video replacement that can be decoded.
         """
+        metadata = self._video_records[index].metadata
+        if self.cached_features:
+            frames = self._load_cached_features(metadata['narration_id'])
+        else:
+            frames = self._load_frames(index)
+        label = self._video_records[index].label
+
+        SEQ_LEN = 10
+        # Only the preceding records of the same untrimmed video contribute to the history.
+        history_index = torch.arange(index - SEQ_LEN, index)
+        valid = history_index >= self._video_start_lut[index]
+        history_index = history_index.clamp(min=0)
+        # Keep only the class indices (-1 when missing); the one-hots are built on the GPU.
+        history_verb = self._verb_lut[history_index].masked_fill(~valid, -1)
+        history_noun = self._noun_lut[history_index].masked_fill(~valid, -1)
+        history_label = torch.stack((history_noun, history_verb), dim=1)
+
+        return frames, history_label, label, index, metadata
+
+    def _load_frames(self, index):
+        """
+        Load, normalize and spatially sample the frames of the given clip.
+        Args:
+            index (int): the video index.
+        Returns:
+            frames (list): the frames of every pathway. The dimension is
+                `channel` x `num frames` x `height` x `width`.
+        """
         if self.mode in ["train", "val", "train+val"]:
             # -1 indicates random sampling.
             temporal_sample_index = -1
@@ -159,24 +209,21 @@ class Epickitchens(torch.utils.data.Dataset):
             max_scale=max_scale,
             crop_size=crop_size,
         )
+        return utils.pack_pathway_output(self.cfg, frames)
 
-        label = self._video_records[index].label
-        frames = utils.pack_pathway_output(self.cfg, frames)
-        metadata = self._video_records[index].metadata
-
-        current_record = self._video_records[index]
-        SEQ_LEN = 10
-        history_label_verb = torch.zeros((SEQ_LEN, self.cfg.MODEL.NUM_CLASSES[0]))
-        history_label_noun = torch.zeros((SEQ_LEN, self.cfg.MODEL.NUM_CLASSES[1]))
-        for i, cur_index in enumerate(range(index - SEQ_LEN, index)):
-            cur_record = self._video_records[cur_index]
-            if cur_record.untrimmed_video_name == current_record.untrimmed_video_name:
-                history_label_verb[i, cur_record.label['verb']] = 1
-                history_label_noun[i, cur_record.label['noun']] = 1
-        history_label = torch.cat((history_label_noun, history_label_verb), dim=1)
-
-        return frames, history_label, label, index, metadata
-
+    def _load_cached_features(self, narration_id):
+        """
+        Load the frozen features of a clip cached in
+        `EPICKITCHENS.FEATURE_CACHE_DIR`, see `cache_features` in
+        `tools/train_net.py`.
+        Args:
+            narration_id (str): the narration id of the clip.
+        Returns:
+            features (list): a single tensor with the inputs of the prediction
+                layer of the model.
+        """
+        path = os.path.join(self.cfg.EPICKITCHENS.FEATURE_CACHE_DIR, narration_id + '.npy')
+        return [torch.from_numpy(np.load(path)).float()]
 
     def __len__(self):
         return len(self._video_records)
@@ -2,25 +2,25 @@ from .video_record import VideoRecord
 
 
 class EpicKitchensVideoRecord(VideoRecord):
-    def __init__(self, tup):
-        self._index = str(tup[0])
-        self._series = tup[1]
+    def __init__(self, dataset, idx):
+        self._col = dataset._col
+        self._idx = idx
 
     @property
     def participant(self):
-        return self._series['participant_id']
+        return self._col['participant_id'][self._idx]
 
     @property
     def untrimmed_video_name(self):
-        return self._series['video_id']
+        return self._col['video_id'][self._idx]
 
     @property
     def start_frame(self):
-        return self._series['start_frame'] - 1
+        return self._col['start_frame'][self._idx] - 1
 
     @property
     def end_frame(self):
-        return self._series['stop_frame'] - 2
+        return self._col['stop_frame'][self._idx] - 2
 
     @property
     def fps(self):
@@ -33,9 +33,9 @@ class EpicKitchensVideoRecord(VideoRecord):
 
     @property
     def label(self):
-        return {'verb': self._series['verb_class'] if 'verb_class' in self._series else -1,
-                'noun': self._series['noun_class'] if 'noun_class' in self._series else -1}
+        return {'verb': self._col['verb_class'][self._idx] if 'verb_class' in self._col else -1,
+                'noun': self._col['noun_class'][self._idx] if 'noun_class' in self._col else -1}
 
     @property
     def metadata(self):
-        return {'narration_id': self._index}
\ No newline at end of file
+        return {'narration_id': self._col['narration_id'][self._idx]}
\ No newline at end of file
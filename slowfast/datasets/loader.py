@@ -50,7 +50,7 @@ def detection_collate(batch):
     return inputs, labels, video_idx, collated_extra_data
 
 
-def construct_loader(cfg, split):
+def construct_loader(cfg, split, ordered=False):
     """
     Constructs the data loader for the given dataset.
     Args:
@@ -58,6 +58,8 @@ def construct_loader(cfg, split):
             slowfast/config/defaults.py
         split (str): the split of the data loader. Options include `train`,
             `val`, and `test`.
+        ordered (bool): if True, visit every sample of the split once, in
+            order: neither shuffle nor drop the last incomplete batch.
     """
     assert split in ["train", "val", "test", "train+val"]
     if split in ["train", "train+val"]:
@@ -75,11 +77,21 @@ def construct_loader(cfg, split):
         batch_size = int(cfg.TEST.BATCH_SIZE / cfg.NUM_GPUS)
         shuffle = False
         drop_last = False
+    if ordered:
+        shuffle = False
+        drop_last = False
 
     # Construct the dataset
     dataset = build_dataset(dataset_name, cfg, split)
     # Create a sampler for multi-process training
-    sampler = DistributedSampler(dataset) if cfg.NUM_GPUS > 1 else None
+    sampler = DistributedSampler(dataset, shuffle=not ordered) if cfg.NUM_GPUS > 1 else None
+    # Worker options are only accepted when loading in worker processes.
+    worker_kwargs = {}
+    if cfg.DATA_LOADER.NUM_WORKERS > 0:
+        worker_kwargs = {
+            "persistent_workers": cfg.DATA_LOADER.PERSISTENT_WORKERS,
+            "prefetch_factor": cfg.DATA_LOADER.PREFETCH_FACTOR,
+        }
     # Create a loader
     loader = torch.utils.data.DataLoader(
         dataset,
@@ -90,6 +102,7 @@ def construct_loader(cfg, split):
         pin_memory=cfg.DATA_LOADER.PIN_MEMORY,
         drop_last=drop_last,
         collate_fn=detection_collate if cfg.DETECTION.ENABLE else None,
+        **worker_kwargs,
     )
     return loader
 
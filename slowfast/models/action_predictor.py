@@ -1,5 +1,97 @@
+import math
+from typing import List, Tuple
+
 import pytorch_lightning
-from torch import nn
+import torch
+import torch.nn.functional as F
+from torch import jit, nn
+from torch import Tensor
+
+
+# Run one batch-first LSTM layer over the whole sequence. The pointwise gate
+# operations of every step are scripted so that they can be fused into a
+# single kernel. The gates follow the `nn.LSTM` layout (input, forget, cell,
+# output).
+@jit.script
+def jit_lstm_layer(x, hx, cx, weight_ih, weight_hh, bias_ih, bias_hh):
+    # type: (Tensor, Tensor, Tensor, Tensor, Tensor, Tensor, Tensor) -> Tuple[Tensor, Tensor, Tensor]
+    # The input projections of all the steps do not depend on the state.
+    x_gates = torch.matmul(x, weight_ih.t()) + bias_ih
+    outputs = jit.annotate(List[Tensor], [])
+    for t in range(x.size(1)):
+        gates = x_gates[:, t] + torch.mm(hx, weight_hh.t()) + bias_hh
+        ingate, forgetgate, cellgate, outgate = gates.chunk(4, 1)
+
+        ingate = torch.sigmoid(ingate)
+        forgetgate = torch.sigmoid(forgetgate)
+        cellgate = torch.tanh(cellgate)
+        outgate = torch.sigmoid(outgate)
+
+        cx = (forgetgate * cx) + (ingate * cellgate)
+        hx = outgate * torch.tanh(cx)
+        outputs += [hx]
+    return torch.stack(outputs, dim=1), hx, cx
+
+
+class JitLSTM(nn.Module):
+    """
+    Batch-first, unidirectional multi-layer LSTM running every layer with
+    `jit_lstm_layer`. It is a drop-in replacement of `nn.LSTM` for the
+    history LSTM: the parameters have the same names, shapes and
+    initialization, so the checkpoints of both are interchangeable.
+    """
+
+    def __init__(self, input_size, hidden_size, num_layers=1, dropout=0.0):
+        super().__init__()
+        self.input_size = input_size
+        self.hidden_size = hidden_size
+        self.num_layers = num_layers
+        self.dropout = dropout
+        for layer in range(num_layers):
+            layer_input_size = input_size if layer == 0 else hidden_size
+            setattr(self, "weight_ih_l{}".format(layer),
+                    nn.Parameter(torch.empty(4 * hidden_size, layer_input_size)))
+            setattr(self, "weight_hh_l{}".format(layer),
+                    nn.Parameter(torch.empty(4 * hidden_size, hidden_size)))
+            setattr(self, "bias_ih_l{}".format(layer), nn.Parameter(torch.empty(4 * hidden_size)))
+            setattr(self, "bias_hh_l{}".format(layer), nn.Parameter(torch.empty(4 * hidden_size)))
+        self.reset_parameters()
+
+    def reset_parameters(self):
+        # Same initialization as `nn.LSTM`.
+        stdv = 1.0 / math.sqrt(self.hidden_size)
+        for weight in self.parameters():
+            nn.init.uniform_(weight, -stdv, stdv)
+
+    def load_from_lstm(self, lstm):
+        """
+        Copy the weights of a batch-first, unidirectional `nn.LSTM`.
+        Args:
+            lstm (nn.LSTM): the LSTM to copy the weights from.
+        """
+        assert lstm.batch_first and not lstm.bidirectional
+        self.load_state_dict(lstm.state_dict())
+
+    def forward(self, x, state=None):
+        if state is None:
+            zeros = x.new_zeros((self.num_layers, x.size(0), self.hidden_size))
+            state = (zeros, zeros)
+        h0, c0 = state
+        hn, cn = [], []
+        output = x
+        for layer in range(self.num_layers):
+            if layer > 0:
+                output = F.dropout(output, self.dropout, self.training)
+            output, hx, cx = jit_lstm_layer(
+                output, h0[layer], c0[layer],
+                getattr(self, "weight_ih_l{}".format(layer)),
+                getattr(self, "weight_hh_l{}".format(layer)),
+                getattr(self, "bias_ih_l{}".format(layer)),
+                getattr(self, "bias_hh_l{}".format(layer)),
+            )
+            hn.append(hx)
+            cn.append(cx)
+        return output, (torch.stack(hn), torch.stack(cn))
 
 
 class ActionPredictor(pytorch_lightning.core.LightningModule):
@@ -7,11 +99,12 @@ class ActionPredictor(pytorch_lightning.core.LightningModule):
     def __init__(self, cfg):
         super().__init__()
         self.rnn = nn.LSTM(input_size=cfg.MODEL.NUM_CLASSES[0] + cfg.MODEL.NUM_CLASSES[1],
-                           hidden_size=20,
+                           hidden_size=cfg.MODEL.LSTM_HIDDEN_SIZE,
                            num_layers=2,
                            dropout=0.1,
                            batch_first=True)
-        self.fc = nn.Linear(in_features=20, out_features=cfg.MODEL.NUM_CLASSES[0] + cfg.MODEL.NUM_CLASSES[1])
+        self.fc = nn.Linear(in_features=cfg.MODEL.LSTM_HIDDEN_SIZE,
+                            out_features=cfg.MODEL.NUM_CLASSES[0] + cfg.MODEL.NUM_CLASSES[1])
 
     def forward(self, x):
         r_out, _ = self.rnn(x, None)
@@ -21,11 +114,17 @@ class ActionPredictor(pytorch_lightning.core.LightningModule):
 class ActionPredictorNoPred(pytorch_lightning.core.LightningModule):
     def __init__(self, cfg, output_dim):
         super().__init__()
-        self.rnn = nn.LSTM(input_size=cfg.MODEL.NUM_CLASSES[0] + cfg.MODEL.NUM_CLASSES[1],
-                           hidden_size=output_dim,
-                           num_layers=2,
-                           dropout=0.1,
-                           batch_first=True)
+        if cfg.MODEL.LSTM_BACKEND == "fused":
+            self.rnn = JitLSTM(input_size=cfg.MODEL.NUM_CLASSES[0] + cfg.MODEL.NUM_CLASSES[1],
+                               hidden_size=output_dim,
+                               num_layers=2,
+                               dropout=0.1)
+        else:
+            self.rnn = nn.LSTM(input_size=cfg.MODEL.NUM_CLASSES[0] + cfg.MODEL.NUM_CLASSES[1],
+                               hidden_size=output_dim,
+                               num_layers=2,
+                               dropout=0.1,
+                               batch_first=True)
 
     def forward(self, x):
         r_out, _ = self.rnn(x, None)
@@ -33,11 +33,13 @@ def build_model(cfg):
     cur_device = torch.cuda.current_device()
     # Transfer the model to the current GPU device
     model = model.cuda(device=cur_device)
+    if cfg.MODEL.CHANNELS_LAST:
+        model = model.to(memory_format=torch.channels_last_3d)
     # Use multi-process data parallel model in the multi-gpu setting
     if cfg.NUM_GPUS > 1:
         # Make model replica operate on the current device
         model = torch.nn.parallel.DistributedDataParallel(
             module=model, device_ids=[cur_device], output_device=cur_device,
-            find_unused_parameters=True
+            find_unused_parameters=True, bucket_cap_mb=cfg.DIST_BUCKET_CAP_MB
         )
     return model
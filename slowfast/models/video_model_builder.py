@@ -9,7 +9,7 @@ import torch.nn as nn
 import slowfast.utils.weight_init_helper as init_helper
 
 from . import head_helper, resnet_helper, stem_helper
-from .action_predictor import ActionPredictorNoPred, ActionPredictor
+from .action_predictor import ActionPredictorNoPred, ActionPredictor, JitLSTM
 from .build import MODEL_REGISTRY
 
 # Number of blocks for different stages given the model depth.
@@ -165,6 +165,7 @@ class SlowFast(nn.Module):
         self.enable_detection = cfg.DETECTION.ENABLE
         self.num_pathways = 2
         self.lstm = cfg.MODEL.LSTM
+        self.freeze_features = False
         self._construct_network(cfg)
         init_helper.init_weights(
             self, cfg.MODEL.FC_INIT_STD, cfg.RESNET.ZERO_INIT_FINAL_BN
@@ -400,12 +401,12 @@ class SlowFast(nn.Module):
                 ],
                 dropout_rate=cfg.MODEL.DROPOUT_RATE,
             )
-            self.lstm_pred = ActionPredictorNoPred(cfg, output_dim=20)
+            self.lstm_pred = ActionPredictorNoPred(cfg, output_dim=cfg.MODEL.LSTM_HIDDEN_SIZE)
             self.pred = head_helper.ResNetPredOnly(
                 dim_in=[
                     width_per_group * 32,
                     width_per_group * 32 // cfg.SLOWFAST.BETA_INV,
-                    20
+                    cfg.MODEL.LSTM_HIDDEN_SIZE
                 ],
                 num_classes=cfg.MODEL.NUM_CLASSES
             )
@@ -425,33 +426,52 @@ class SlowFast(nn.Module):
 
     def load_from_lstm(self, lstm_model: ActionPredictor):
         if self.lstm:
-            self.lstm_pred.rnn = lstm_model.rnn
+            if isinstance(self.lstm_pred.rnn, JitLSTM):
+                self.lstm_pred.rnn.load_from_lstm(lstm_model.rnn)
+            else:
+                self.lstm_pred.rnn = lstm_model.rnn
 
-    def forward(self, x, bboxes=None):
+    def forward(self, x, bboxes=None, feature_mode=None):
+        """
+        Args:
+            feature_mode (str): only used with the history LSTM. If `extract`,
+                return the inputs of the prediction layer instead of the
+                predictions. If `cached`, the visual input already holds these
+                inputs and only the prediction layer is run.
+        """
         if self.lstm:
             lstm_input = x[1]
             x = x[0]
-        x = self.s1(x)
-        x = self.s1_fuse(x)
-        x = self.s2(x)
-        x = self.s2_fuse(x)
-        for pathway in range(self.num_pathways):
-            pool = getattr(self, "pathway{}_pool".format(pathway))
-            x[pathway] = pool(x[pathway])
-        x = self.s3(x)
-        x = self.s3_fuse(x)
-        x = self.s4(x)
-        x = self.s4_fuse(x)
-        x = self.s5(x)
-        if not self.lstm:
-            if self.enable_detection:
-                x = self.head(x, bboxes)
-            else:
-                x = self.head(x)
-        else:
+            if feature_mode == "cached":
+                return self.pred(x[0])
+        # Once everything but the prediction layer is frozen, the features do
+        # not need autograd; skip recording them to save activation memory.
+        frozen = self.lstm and self.freeze_features
+        with torch.set_grad_enabled(torch.is_grad_enabled() and not frozen):
+            x = self.s1(x)
+            x = self.s1_fuse(x)
+            x = self.s2(x)
+            x = self.s2_fuse(x)
+            for pathway in range(self.num_pathways):
+                pool = getattr(self, "pathway{}_pool".format(pathway))
+                x[pathway] = pool(x[pathway])
+            x = self.s3(x)
+            x = self.s3_fuse(x)
+            x = self.s4(x)
+            x = self.s4_fuse(x)
+            x = self.s5(x)
+            if not self.lstm:
+                if self.enable_detection:
+                    x = self.head(x, bboxes)
+                else:
+                    x = self.head(x)
+                return x
             x = self.head(x)
             lstm_output = self.lstm_pred(lstm_input)
-            x = self.pred(torch.cat((x, lstm_output.view((x.shape[0], 1, 1, 1, -1))), dim=-1))
+            x = torch.cat((x, lstm_output.view((x.shape[0], 1, 1, 1, -1))), dim=-1)
+        if feature_mode == "extract":
+            return x
+        x = self.pred(x)
         return x
 
     def freeze_fn(self, freeze_mode):
@@ -471,6 +491,7 @@ class SlowFast(nn.Module):
                     m.eval()
         elif freeze_mode == 'all_but_last':
             print("Freezing all but the last linear layer.")
+            self.freeze_features = True
             for m in self.children():
                 if not isinstance(m, head_helper.ResNetPredOnly):
                     _recursive_freeze(m)
@@ -91,7 +91,7 @@ def is_checkpoint_epoch(cur_epoch, checkpoint_period):
     return (cur_epoch + 1) % checkpoint_period == 0
 
 
-def save_checkpoint(path_to_job, model, optimizer, epoch, cfg, is_best_epoch=False):
+def save_checkpoint(path_to_job, model, optimizer, epoch, cfg, is_best_epoch=False, scaler=None):
     """
     Save a checkpoint.
     Args:
@@ -99,6 +99,8 @@ def save_checkpoint(path_to_job, model, optimizer, epoch, cfg, is_best_epoch=Fal
         optimizer (optim): optimizer to save the historical state.
         epoch (int): current number of epoch of the model.
         cfg (CfgNode): configs to save.
+        scaler (GradScaler): mixed precision gradient scaler to save the loss
+            scale of.
     """
     # Save checkpoints only from the master process.
     if not du.is_master_proc(cfg.NUM_GPUS * cfg.NUM_SHARDS):
@@ -114,6 +116,8 @@ def save_checkpoint(path_to_job, model, optimizer, epoch, cfg, is_best_epoch=Fal
         "optimizer_state": optimizer.state_dict(),
         "cfg": cfg.dump(),
     }
+    if scaler is not None and scaler.is_enabled():
+        checkpoint["scaler_state"] = scaler.state_dict()
     # Write the checkpoint.
     path_to_checkpoint = get_path_to_checkpoint(path_to_job, epoch + 1, is_best_epoch)
     torch.save(checkpoint, path_to_checkpoint)
@@ -160,6 +164,7 @@ def load_checkpoint(
     optimizer=None,
     inflation=False,
     convert_from_caffe2=False,
+    scaler=None,
 ):
     """
     Load the checkpoint from the given file. If inflation is True, inflate the
@@ -173,6 +178,8 @@ def load_checkpoint(
         inflation (bool): if True, inflate the weights from the checkpoint.
         convert_from_caffe2 (bool): if True, load the model from caffe2 and
             convert it to pytorch.
+        scaler (GradScaler): mixed precision gradient scaler to load the loss
+            scale to.
     Returns:
         (int): the number of training epoch of the checkpoint.
     """
@@ -242,6 +249,8 @@ def load_checkpoint(
             # Load the optimizer state (commonly not done when fine-tuning)
             if optimizer:
                 optimizer.load_state_dict(checkpoint["optimizer_state"])
+            if scaler is not None and "scaler_state" in checkpoint:
+                scaler.load_state_dict(checkpoint["scaler_state"])
         if "epoch" in checkpoint.keys():
             epoch = checkpoint["epoch"]
         else:
@@ -7,9 +7,9 @@ import datetime
 import numpy as np
 import os
 from collections import defaultdict, deque
+from typing import TYPE_CHECKING
 import torch
 from fvcore.common.timer import Timer
-from torch.utils.tensorboard import SummaryWriter
 
 import slowfast.datasets.ava_helper as ava_helper
 import slowfast.utils.logging as logging
@@ -22,6 +22,10 @@ from slowfast.utils.ava_eval_helper import (
     read_labelmap,
 )
 
+if TYPE_CHECKING:
+    # Only used in annotations, tensorboard is needed by training alone.
+    from torch.utils.tensorboard import SummaryWriter
+
 logger = logging.get_logger(__name__)
 
 
@@ -610,7 +614,7 @@ class ValMeter(object):
         return is_best_epoch
 
 
-def log_to_tensorboard(writer: SummaryWriter, stats: {str: float}, new_iter: bool = True):
+def log_to_tensorboard(writer: "SummaryWriter", stats: {str: float}, new_iter: bool = True):
     global_iter = writer.global_iter
     if new_iter:
         writer.global_iter += 1
@@ -660,7 +664,7 @@ class EPICTrainMeter(object):
         self.num_noun_top5_cor = 0
         self.num_samples = 0
 
-        self.tb_writer: SummaryWriter = summary_writer
+        self.tb_writer: "SummaryWriter" = summary_writer
 
     def reset(self):
         """
@@ -845,7 +849,7 @@ class EPICValMeter(object):
         self.num_noun_top5_cor = 0
         self.num_samples = 0
 
-        self.tb_writer: SummaryWriter = summary_writer
+        self.tb_writer: "SummaryWriter" = summary_writer
 
     def reset(self):
         """
@@ -8,7 +8,7 @@ import sys
 import torch
 import slowfast.utils.checkpoint as cu
 import slowfast.utils.multiprocessing as mpu
-from slowfast.config.defaults import get_cfg
+from slowfast.config.defaults import assert_and_infer_cfg, get_cfg
 
 from test_net import test
 from train_net import train
@@ -93,6 +93,9 @@ def load_config(args):
     if hasattr(args, "output_dir"):
         cfg.OUTPUT_DIR = args.output_dir
 
+    # Check the merged configs, not only the defaults.
+    cfg = assert_and_infer_cfg(cfg)
+
     # Create the checkpoint dir.
     cu.make_checkpoint_dir(cfg.OUTPUT_DIR)
     return cfg
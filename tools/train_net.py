@@ -2,15 +2,16 @@
 # Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
 
 """Train a video classification model."""
+import contextlib
 import datetime
+import json
 import os
+import shutil
 
 import numpy as np
-from scipy.stats import gmean
 import pprint
 import torch
-from torch.utils.tensorboard import SummaryWriter
-from fvcore.nn.precise_bn import get_bn_modules, update_bn_stats
+import torch.nn.functional as F
 
 import slowfast.models.losses as losses
 import slowfast.models.optimizer as optim
@@ -27,7 +28,27 @@ from slowfast.utils.meters import AVAMeter, TrainMeter, ValMeter, EPICTrainMeter
 logger = logging.get_logger(__name__)
 
 
-def train_epoch(train_loader, model, optimizer, train_meter, cur_epoch, cfg):
+def _history_label_one_hot(history_label, num_classes):
+    """
+    Expand the history class indices into the noun and verb one-hot vectors
+    fed to the LSTM. Entries marked with -1 produce all-zero vectors.
+    Args:
+        history_label (tensor): noun and verb class indices, the dimension is
+            `batch size` x `seq len` x 2.
+        num_classes (list): number of verb and noun classes.
+    Returns:
+        (tensor): one-hot history labels, the dimension is `batch size` x
+            `seq len` x (`num noun classes` + `num verb classes`).
+    """
+    history_noun, history_verb = history_label.unbind(-1)
+    noun_one_hot = F.one_hot(history_noun.clamp(min=0), num_classes[1])
+    noun_one_hot.mul_((history_noun >= 0).unsqueeze(-1))
+    verb_one_hot = F.one_hot(history_verb.clamp(min=0), num_classes[0])
+    verb_one_hot.mul_((history_verb >= 0).unsqueeze(-1))
+    return torch.cat((noun_one_hot, verb_one_hot), dim=-1).float()
+
+
+def train_epoch(train_loader, model, optimizer, scaler, train_meter, cur_epoch, cfg):
     """
     Perform the video training for one epoch.
     Args:
@@ -35,6 +56,8 @@ def train_epoch(train_loader, model, optimizer, train_meter, cur_epoch, cfg):
         model (model): the video model to train.
         optimizer (optim): the optimizer to perform optimization on the model's
             parameters.
+        scaler (GradScaler): scales the loss when training with mixed
+            precision.
         train_meter (TrainMeter): training meters to log the training performance.
         cur_epoch (int): current epoch of training.
         cfg (CfgNode): configs. Details can be found in
@@ -48,15 +71,25 @@ def train_epoch(train_loader, model, optimizer, train_meter, cur_epoch, cfg):
 
     train_meter.iter_tic()
     data_size = len(train_loader)
+    num_classes = cfg.MODEL.NUM_CLASSES
+    memory_format = torch.channels_last_3d if cfg.MODEL.CHANNELS_LAST else torch.contiguous_format
+    # Explicitly declare reduction to mean.
+    loss_fun = losses.get_loss_func(cfg.MODEL.LOSS_FUNC)(reduction="mean")
+    # Gradients are accumulated over this many iterations per update.
+    accum_steps = cfg.TRAIN.ACCUM_STEPS
+    feature_mode = "cached" if getattr(train_loader.dataset, "cached_features", False) else None
+    optimizer.zero_grad()
 
     for cur_iter, (inputs_img, inputs_label, labels, _, meta) in enumerate(train_loader):
         # Transfer the data to the current GPU device.
         if isinstance(inputs_img, (list,)):
             for i in range(len(inputs_img)):
-                inputs_img[i] = inputs_img[i].cuda(non_blocking=True)
+                inputs_img[i] = inputs_img[i].cuda(non_blocking=True).contiguous(memory_format=memory_format)
         else:
-            inputs_img = inputs_img.cuda(non_blocking=True)
-        inputs_label = inputs_label.cuda()
+            inputs_img = inputs_img.cuda(non_blocking=True).contiguous(memory_format=memory_format)
+        inputs_label = _history_label_one_hot(
+            inputs_label.cuda(non_blocking=True), num_classes
+        )
         if isinstance(labels, (dict,)):
             labels = {k: v.cuda() for k, v in labels.items()}
         else:
@@ -73,136 +106,104 @@ def train_epoch(train_loader, model, optimizer, train_meter, cur_epoch, cfg):
         lr = optim.get_epoch_lr(cur_epoch + float(cur_iter) / data_size, cfg)
         optim.set_lr(optimizer, lr)
 
-        if not cfg.MODEL.LSTM:
-            if cfg.DETECTION.ENABLE:
-                # Compute the predictions.
-                preds = model(inputs_img, meta["boxes"])
-
-            else:
-                # Perform the forward pass.
-                preds = model(inputs_img)
+        # Skip the gradient all-reduce on the micro-batches without an update.
+        update_step = (cur_iter + 1) % accum_steps == 0 or cur_iter + 1 == data_size
+        # The last group of an epoch may hold fewer than accum_steps iterations.
+        accum_size = min(accum_steps, data_size - cur_iter // accum_steps * accum_steps)
+        if cfg.NUM_GPUS > 1 and not update_step:
+            sync_context = model.no_sync()
         else:
-            preds = model([inputs_img, inputs_label])
-
-        if isinstance(labels, (dict,)):
-            # Explicitly declare reduction to mean.
-            loss_fun = losses.get_loss_func(cfg.MODEL.LOSS_FUNC)(reduction="mean")
-
-            # Compute the loss.
-            loss_verb = loss_fun(preds[0], labels['verb'])
-            loss_noun = loss_fun(preds[1], labels['noun'])
-            loss = 0.5 * (loss_verb + loss_noun)
-
-            # check Nan Loss.
-            misc.check_nan_losses(loss)
-        else:
-            # Explicitly declare reduction to mean.
-            loss_fun = losses.get_loss_func(cfg.MODEL.LOSS_FUNC)(reduction="mean")
-
-            # Compute the loss.
-            loss = loss_fun(preds, labels)
-
-            # check Nan Loss.
-            misc.check_nan_losses(loss)
-
-        # Perform the backward pass.
-        optimizer.zero_grad()
-        loss.backward()
-        # Update the parameters.
-        optimizer.step()
-
+            sync_context = contextlib.nullcontext()
+        with sync_context:
+            with torch.cuda.amp.autocast(enabled=cfg.TRAIN.MIXED_PRECISION):
+                if not cfg.MODEL.LSTM:
+                    if cfg.DETECTION.ENABLE:
+                        # Compute the predictions.
+                        preds = model(inputs_img, meta["boxes"])
+
+                    else:
+                        # Perform the forward pass.
+                        preds = model(inputs_img)
+                else:
+                    preds = model([inputs_img, inputs_label], feature_mode=feature_mode)
+
+                if isinstance(labels, (dict,)):
+                    # Compute the loss.
+                    loss_verb = loss_fun(preds[0], labels['verb'])
+                    loss_noun = loss_fun(preds[1], labels['noun'])
+                    loss = 0.5 * (loss_verb + loss_noun)
+                else:
+                    # Compute the loss.
+                    loss = loss_fun(preds, labels)
+
+            # Perform the backward pass.
+            scaler.scale(loss / accum_size).backward()
         if cfg.DETECTION.ENABLE:
             if cfg.NUM_GPUS > 1:
                 loss = du.all_reduce([loss])[0]
             loss = loss.item()
-
-            train_meter.iter_toc()
-            # Update and log stats.
-            train_meter.update_stats(None, None, None, loss, lr)
+        elif isinstance(labels, (dict,)):
+            # Compute the verb, noun and action accuracies.
+            verb_top1_acc, verb_top5_acc = metrics.topk_accuracies(preds[0], labels['verb'], (1, 5))
+            noun_top1_acc, noun_top5_acc = metrics.topk_accuracies(preds[1], labels['noun'], (1, 5))
+            action_top1_acc, action_top5_acc = metrics.multitask_topk_accuracies((preds[0], preds[1]),
+                                                                                 (labels['verb'], labels['noun']),
+                                                                                 (1, 5))
+            stats = torch.stack([
+                loss_verb, verb_top1_acc, verb_top5_acc,
+                loss_noun, noun_top1_acc, noun_top5_acc,
+                loss, action_top1_acc, action_top5_acc,
+            ]).detach()
+
+            # Gather all the predictions across all the devices.
+            if cfg.NUM_GPUS > 1:
+                stats = du.all_reduce([stats])[0]
+
+            # Copy the stats from GPU to CPU (sync point).
+            (
+                loss_verb, verb_top1_acc, verb_top5_acc,
+                loss_noun, noun_top1_acc, noun_top5_acc,
+                loss, action_top1_acc, action_top5_acc,
+            ) = stats.cpu().tolist()
         else:
-            if isinstance(labels, (dict,)):
-                # Compute the verb accuracies.
-                verb_top1_acc, verb_top5_acc = metrics.topk_accuracies(preds[0], labels['verb'], (1, 5))
-
-                # Gather all the predictions across all the devices.
-                if cfg.NUM_GPUS > 1:
-                    loss_verb, verb_top1_acc, verb_top5_acc = du.all_reduce(
-                        [loss_verb, verb_top1_acc, verb_top5_acc]
-                    )
-
-                # Copy the stats from GPU to CPU (sync point).
-                loss_verb, verb_top1_acc, verb_top5_acc = (
-                    loss_verb.item(),
-                    verb_top1_acc.item(),
-                    verb_top5_acc.item(),
-                )
+            # Compute the errors.
+            num_topks_correct = metrics.topks_correct(preds, labels, (1, 5))
+            top1_err, top5_err = [
+                (1.0 - x / preds.size(0)) * 100.0 for x in num_topks_correct
+            ]
+            stats = torch.stack([loss, top1_err, top5_err]).detach()
+
+            # Gather all the predictions across all the devices.
+            if cfg.NUM_GPUS > 1:
+                stats = du.all_reduce([stats])[0]
 
-                # Compute the noun accuracies.
-                noun_top1_acc, noun_top5_acc = metrics.topk_accuracies(preds[1], labels['noun'], (1, 5))
+            # Copy the stats from GPU to CPU (sync point).
+            loss, top1_err, top5_err = stats.cpu().tolist()
 
-                # Gather all the predictions across all the devices.
-                if cfg.NUM_GPUS > 1:
-                    loss_noun, noun_top1_acc, noun_top5_acc = du.all_reduce(
-                        [loss_noun, noun_top1_acc, noun_top5_acc]
-                    )
-
-                # Copy the stats from GPU to CPU (sync point).
-                loss_noun, noun_top1_acc, noun_top5_acc = (
-                    loss_noun.item(),
-                    noun_top1_acc.item(),
-                    noun_top5_acc.item(),
-                )
+        # check Nan Loss before it reaches the parameters.
+        misc.check_nan_losses(loss)
 
-                # Compute the action accuracies.
-                action_top1_acc, action_top5_acc = metrics.multitask_topk_accuracies((preds[0], preds[1]),
-                                                                                     (labels['verb'], labels['noun']),
-                                                                                     (1, 5))
-                # Gather all the predictions across all the devices.
-                if cfg.NUM_GPUS > 1:
-                    loss, action_top1_acc, action_top5_acc = du.all_reduce(
-                        [loss, action_top1_acc, action_top5_acc]
-                    )
-
-                # Copy the stats from GPU to CPU (sync point).
-                loss, action_top1_acc, action_top5_acc = (
-                    loss.item(),
-                    action_top1_acc.item(),
-                    action_top5_acc.item(),
-                )
-
-                train_meter.iter_toc()
-                # Update and log stats.
-                train_meter.update_stats(
-                    (verb_top1_acc, noun_top1_acc, action_top1_acc),
-                    (verb_top5_acc, noun_top5_acc, action_top5_acc),
-                    (loss_verb, loss_noun, loss),
-                    lr, inputs_img[0].size(0) * cfg.NUM_GPUS
-                )
-            else:
-                # Compute the errors.
-                num_topks_correct = metrics.topks_correct(preds, labels, (1, 5))
-                top1_err, top5_err = [
-                    (1.0 - x / preds.size(0)) * 100.0 for x in num_topks_correct
-                ]
+        if update_step:
+            # Update the parameters.
+            scaler.step(optimizer)
+            scaler.update()
+            optimizer.zero_grad()
 
-                # Gather all the predictions across all the devices.
-                if cfg.NUM_GPUS > 1:
-                    loss, top1_err, top5_err = du.all_reduce(
-                        [loss, top1_err, top5_err]
-                    )
-
-                # Copy the stats from GPU to CPU (sync point).
-                loss, top1_err, top5_err = (
-                    loss.item(),
-                    top1_err.item(),
-                    top5_err.item(),
-                )
-
-                train_meter.iter_toc()
-                # Update and log stats.
-                train_meter.update_stats(
-                    top1_err, top5_err, loss, lr, inputs_img[0].size(0) * cfg.NUM_GPUS
-                )
+        train_meter.iter_toc()
+        # Update and log stats.
+        if cfg.DETECTION.ENABLE:
+            train_meter.update_stats(None, None, None, loss, lr)
+        elif isinstance(labels, (dict,)):
+            train_meter.update_stats(
+                (verb_top1_acc, noun_top1_acc, action_top1_acc),
+                (verb_top5_acc, noun_top5_acc, action_top5_acc),
+                (loss_verb, loss_noun, loss),
+                lr, inputs_img[0].size(0) * cfg.NUM_GPUS
+            )
+        else:
+            train_meter.update_stats(
+                top1_err, top5_err, loss, lr, inputs_img[0].size(0) * cfg.NUM_GPUS
+            )
         train_meter.log_iter_stats(cur_epoch, cur_iter)
         train_meter.iter_tic()
     # Log epoch stats.
@@ -225,15 +226,19 @@ def eval_epoch(val_loader, model, val_meter, cur_epoch, cfg):
     # Evaluation mode enabled. The running stats would not be updated.
     model.eval()
     val_meter.iter_tic()
+    num_classes = cfg.MODEL.NUM_CLASSES
+    memory_format = torch.channels_last_3d if cfg.MODEL.CHANNELS_LAST else torch.contiguous_format
 
     for cur_iter, (inputs_img, inputs_label, labels, _, meta) in enumerate(val_loader):
         # Transferthe data to the current GPU device.
         if isinstance(inputs_img, (list,)):
             for i in range(len(inputs_img)):
-                inputs_img[i] = inputs_img[i].cuda(non_blocking=True)
+                inputs_img[i] = inputs_img[i].cuda(non_blocking=True).contiguous(memory_format=memory_format)
         else:
-            inputs_img = inputs_img.cuda(non_blocking=True)
-        inputs_label = inputs_label.cuda()
+            inputs_img = inputs_img.cuda(non_blocking=True).contiguous(memory_format=memory_format)
+        inputs_label = _history_label_one_hot(
+            inputs_label.cuda(non_blocking=True), num_classes
+        )
         if isinstance(labels, (dict,)):
             labels = {k: v.cuda() for k, v in labels.items()}
         else:
@@ -263,41 +268,34 @@ def eval_epoch(val_loader, model, val_meter, cur_epoch, cfg):
             # Update and log stats.
             val_meter.update_stats(preds.cpu(), ori_boxes.cpu(), metadata.cpu())
         else:
-            if cfg.MODEL.LSTM:
-                preds = model([inputs_img, inputs_label])
-            else:
-                preds = model(inputs_img)
+            with torch.cuda.amp.autocast(enabled=cfg.TRAIN.MIXED_PRECISION):
+                if cfg.MODEL.LSTM:
+                    preds = model([inputs_img, inputs_label])
+                else:
+                    preds = model(inputs_img)
             if isinstance(labels, (dict,)):
-                # Compute the verb accuracies.
+                # Compute the verb, noun and action accuracies.
                 verb_top1_acc, verb_top5_acc = metrics.topk_accuracies(preds[0], labels['verb'], (1, 5))
-
-                # Combine the errors across the GPUs.
-                if cfg.NUM_GPUS > 1:
-                    verb_top1_acc, verb_top5_acc = du.all_reduce([verb_top1_acc, verb_top5_acc])
-
-                # Copy the errors from GPU to CPU (sync point).
-                verb_top1_acc, verb_top5_acc = verb_top1_acc.item(), verb_top5_acc.item()
-
-                # Compute the noun accuracies.
                 noun_top1_acc, noun_top5_acc = metrics.topk_accuracies(preds[1], labels['noun'], (1, 5))
-
-                # Combine the errors across the GPUs.
-                if cfg.NUM_GPUS > 1:
-                    noun_top1_acc, noun_top5_acc = du.all_reduce([noun_top1_acc, noun_top5_acc])
-
-                # Copy the errors from GPU to CPU (sync point).
-                noun_top1_acc, noun_top5_acc = noun_top1_acc.item(), noun_top5_acc.item()
-
-                # Compute the action accuracies.
                 action_top1_acc, action_top5_acc = metrics.multitask_topk_accuracies((preds[0], preds[1]),
                                                                                      (labels['verb'], labels['noun']),
                                                                                      (1, 5))
+                stats = torch.stack([
+                    verb_top1_acc, verb_top5_acc,
+                    noun_top1_acc, noun_top5_acc,
+                    action_top1_acc, action_top5_acc,
+                ])
+
                 # Combine the errors across the GPUs.
                 if cfg.NUM_GPUS > 1:
-                    action_top1_acc, action_top5_acc = du.all_reduce([action_top1_acc, action_top5_acc])
+                    stats = du.all_reduce([stats])[0]
 
                 # Copy the errors from GPU to CPU (sync point).
-                action_top1_acc, action_top5_acc = action_top1_acc.item(), action_top5_acc.item()
+                (
+                    verb_top1_acc, verb_top5_acc,
+                    noun_top1_acc, noun_top5_acc,
+                    action_top1_acc, action_top5_acc,
+                ) = stats.cpu().tolist()
 
                 val_meter.iter_toc()
                 # Update and log stats.
@@ -314,11 +312,12 @@ def eval_epoch(val_loader, model, val_meter, cur_epoch, cfg):
                 top1_err, top5_err = [
                     (1.0 - x / preds.size(0)) * 100.0 for x in num_topks_correct
                 ]
+                stats = torch.stack([top1_err, top5_err])
                 if cfg.NUM_GPUS > 1:
-                    top1_err, top5_err = du.all_reduce([top1_err, top5_err])
+                    stats = du.all_reduce([stats])[0]
 
                 # Copy the errors from GPU to CPU (sync point).
-                top1_err, top5_err = top1_err.item(), top5_err.item()
+                top1_err, top5_err = stats.cpu().tolist()
 
                 val_meter.iter_toc()
                 # Update and log stats.
@@ -333,6 +332,52 @@ def eval_epoch(val_loader, model, val_meter, cur_epoch, cfg):
     return is_best_epoch
 
 
+def _file_fingerprint(path):
+    """
+    Identify the contents of a file by its size and modification time.
+    Args:
+        path (str): path to the file, may be empty.
+    Returns:
+        (list or None): path, size and modification time of the file, or None
+            if the path is empty.
+    """
+    if path == "":
+        return None
+    stat = os.stat(path)
+    return [path, stat.st_size, stat.st_mtime_ns]
+
+
+@torch.no_grad()
+def cache_features(cache_loader, model, cache_dir, cfg):
+    """
+    Compute the frozen features of the LSTM model for every clip and store
+    them as float16 `.npy` files, named after the narration id, in
+    `cache_dir`. The distributed sampler pads the last shard with repeated
+    clips; only the process owning a clip writes its features.
+    Args:
+        cache_loader (loader): data loader to provide the clips to cache.
+        model (model): the frozen model to compute the features with.
+        cache_dir (str): the directory to store the features in.
+        cfg (CfgNode): configs. Details can be found in
+            slowfast/config/defaults.py
+    """
+    model.eval()
+    num_classes = cfg.MODEL.NUM_CLASSES
+    world_size, rank = du.get_world_size(), du.get_rank()
+    for inputs_img, inputs_label, _, index, meta in cache_loader:
+        for i in range(len(inputs_img)):
+            inputs_img[i] = inputs_img[i].cuda(non_blocking=True)
+        inputs_label = _history_label_one_hot(
+            inputs_label.cuda(non_blocking=True), num_classes
+        )
+        with torch.cuda.amp.autocast(enabled=cfg.TRAIN.MIXED_PRECISION):
+            features = model([inputs_img, inputs_label], feature_mode="extract")
+        features = features.half().cpu().numpy()
+        for idx, narration_id, feature in zip(index.tolist(), meta["narration_id"], features):
+            if idx % world_size == rank:
+                np.save(os.path.join(cache_dir, narration_id + ".npy"), feature)
+
+
 def calculate_and_update_precise_bn(loader, model, num_iters=200):
     """
     Update the stats in bn layers by calculate the precise stats.
@@ -341,6 +386,7 @@ def calculate_and_update_precise_bn(loader, model, num_iters=200):
         model (model): model to update the bn stats.
         num_iters (int): number of iterations to compute and update the bn stats.
     """
+    from fvcore.nn.precise_bn import update_bn_stats
 
     def _gen_loader():
         for inputs, _, _, _ in loader:
@@ -362,9 +408,15 @@ def train(cfg):
         cfg (CfgNode): configs. Details can be found in
             slowfast/config/defaults.py
     """
+    # Only needed for training, keep them out of the module import time.
+    from fvcore.nn.precise_bn import get_bn_modules
+    from torch.utils.tensorboard import SummaryWriter
+
     # Set random seed from configs.
     np.random.seed(cfg.RNG_SEED)
     torch.manual_seed(cfg.RNG_SEED)
+    # The input clips have a fixed size, let cuDNN pick the fastest kernels.
+    torch.backends.cudnn.benchmark = True
 
     # Setup logging format.
     logging.setup_logging()
@@ -379,8 +431,10 @@ def train(cfg):
     original_cfg_model_lstm = cfg.MODEL.LSTM
     cfg.MODEL.LSTM = False
     non_lstm_model = build_model(cfg)
-    cu.load_checkpoint("./pretrained/SlowFast.pyth", non_lstm_model, cfg.NUM_GPUS > 1)
-    model_lstm = ActionPredictor.load_from_checkpoint("./pretrained/lstm.ckpt", cfg=cfg)
+    slowfast_checkpoint = "./pretrained/SlowFast.pyth"
+    lstm_checkpoint = "./pretrained/lstm.ckpt"
+    cu.load_checkpoint(slowfast_checkpoint, non_lstm_model, cfg.NUM_GPUS > 1)
+    model_lstm = ActionPredictor.load_from_checkpoint(lstm_checkpoint, cfg=cfg)
     model.load_from_non_lstm(non_lstm_model.cuda())
     model.load_from_lstm(model_lstm.cuda())
     cfg.MODEL.LSTM = original_cfg_model_lstm
@@ -394,13 +448,14 @@ def train(cfg):
 
     # Construct the optimizer.
     optimizer = optim.construct_optimizer(model, cfg)
+    scaler = torch.cuda.amp.GradScaler(enabled=cfg.TRAIN.MIXED_PRECISION)
 
     # Load a checkpoint to resume training if applicable.
     if cfg.TRAIN.AUTO_RESUME and cu.has_checkpoint(cfg.OUTPUT_DIR):
         logger.info("Load from last checkpoint.")
         last_checkpoint = cu.get_last_checkpoint(cfg.OUTPUT_DIR)
         checkpoint_epoch = cu.load_checkpoint(
-            last_checkpoint, model, cfg.NUM_GPUS > 1, optimizer
+            last_checkpoint, model, cfg.NUM_GPUS > 1, optimizer, scaler=scaler
         )
         start_epoch = checkpoint_epoch + 1
     elif cfg.TRAIN.CHECKPOINT_FILE_PATH != "" and not cfg.TRAIN.FINETUNE:
@@ -412,6 +467,7 @@ def train(cfg):
             optimizer,
             inflation=cfg.TRAIN.CHECKPOINT_INFLATE,
             convert_from_caffe2=cfg.TRAIN.CHECKPOINT_TYPE == "caffe2",
+            scaler=scaler,
         )
         start_epoch = checkpoint_epoch + 1
     elif cfg.TRAIN.CHECKPOINT_FILE_PATH != "" and cfg.TRAIN.FINETUNE:
@@ -423,6 +479,7 @@ def train(cfg):
             optimizer,
             inflation=cfg.TRAIN.CHECKPOINT_INFLATE,
             convert_from_caffe2=cfg.TRAIN.CHECKPOINT_TYPE == "caffe2",
+            scaler=scaler,
         )
         start_epoch = 0
     else:
@@ -436,6 +493,70 @@ def train(cfg):
         train_loader = loader.construct_loader(cfg, "train+val")
         val_loader = loader.construct_loader(cfg, "val")
 
+    # Only the prediction layer is trained, so its inputs can be computed once.
+    if cfg.MODEL.LSTM and cfg.EPICKITCHENS.FEATURE_CACHE_DIR != "":
+        cache_dir = cfg.EPICKITCHENS.FEATURE_CACHE_DIR
+        # Everything the cached features depend on. The checkpoints of an
+        # auto resumed run only differ in the trained prediction layer, so
+        # they do not invalidate the cache.
+        pred = (model.module if cfg.NUM_GPUS > 1 else model).pred
+        manifest = {
+            "slowfast_checkpoint": _file_fingerprint(slowfast_checkpoint),
+            "lstm_checkpoint": _file_fingerprint(lstm_checkpoint),
+            "checkpoint_file": _file_fingerprint(cfg.TRAIN.CHECKPOINT_FILE_PATH),
+            "lstm_hidden_size": cfg.MODEL.LSTM_HIDDEN_SIZE,
+            "feature_dim": next(pred.parameters()).size(1),
+            "mixed_precision": cfg.TRAIN.MIXED_PRECISION,
+            "split": train_loader.dataset.mode,
+            "visual_data_dir": cfg.EPICKITCHENS.VISUAL_DATA_DIR,
+            "annotations_dir": cfg.EPICKITCHENS.ANNOTATIONS_DIR,
+            "train_list": cfg.EPICKITCHENS.TRAIN_LIST,
+            "val_list": cfg.EPICKITCHENS.VAL_LIST,
+            "num_frames": cfg.DATA.NUM_FRAMES,
+            "sampling_rate": cfg.DATA.SAMPLING_RATE,
+            "train_jitter_scales": list(cfg.DATA.TRAIN_JITTER_SCALES),
+            "train_crop_size": cfg.DATA.TRAIN_CROP_SIZE,
+        }
+        manifest_path = os.path.join(cache_dir, "manifest.json")
+        # Every process must agree on the cache state before any creates it.
+        cache_exists = os.path.isdir(cache_dir)
+        du.synchronize()
+        if not cache_exists:
+            logger.info("Caching features in {}.".format(cache_dir))
+            # The features are written to a temporary directory that is only
+            # renamed once complete, so an interrupted run leaves no cache.
+            tmp_dir = cache_dir.rstrip(os.sep) + ".tmp"
+            if du.is_master_proc(cfg.NUM_GPUS * cfg.NUM_SHARDS):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                os.makedirs(tmp_dir)
+            du.synchronize()
+            # Use a separate loader that visits every clip once, so that the
+            # persistent train workers only ever see the dataset in cached
+            # mode.
+            cache_loader = loader.construct_loader(cfg, train_loader.dataset.mode, ordered=True)
+            cache_features(cache_loader, model, tmp_dir, cfg)
+            # Shut its persistent workers down.
+            del cache_loader
+            du.synchronize()
+            if du.is_master_proc(cfg.NUM_GPUS * cfg.NUM_SHARDS):
+                with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+                    json.dump(manifest, f, indent=2)
+                os.rename(tmp_dir, cache_dir)
+            du.synchronize()
+        if not os.path.isfile(manifest_path):
+            raise ValueError(
+                "Feature cache {} has no manifest, it is incomplete or was "
+                "built by an older version. Remove it to rebuild it.".format(cache_dir)
+            )
+        with open(manifest_path) as f:
+            cached_manifest = json.load(f)
+        if cached_manifest != manifest:
+            raise ValueError(
+                "Feature cache {} was built with {}, but the current run "
+                "expects {}. Remove it to rebuild it.".format(cache_dir, cached_manifest, manifest)
+            )
+        train_loader.dataset.cached_features = True
+
     if cfg.EPICKITCHENS.TB_DIR == "":
         current_datetime = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
         writer_dir = os.path.join("./runs/", current_datetime)
@@ -464,7 +585,7 @@ def train(cfg):
         # Shuffle the dataset.
         loader.shuffle_dataset(train_loader, cur_epoch)
         # Train for one epoch.
-        train_epoch(train_loader, model, optimizer, train_meter, cur_epoch, cfg)
+        train_epoch(train_loader, model, optimizer, scaler, train_meter, cur_epoch, cfg)
 
         # Compute precise BN stats.
         if cfg.BN.USE_PRECISE_STATS and len(get_bn_modules(model)) > 0:
@@ -474,10 +595,12 @@ def train(cfg):
 
         # Save a checkpoint.
         if cu.is_checkpoint_epoch(cur_epoch, cfg.TRAIN.CHECKPOINT_PERIOD):
-            cu.save_checkpoint(cfg.OUTPUT_DIR, model, optimizer, cur_epoch, cfg)
+            cu.save_checkpoint(cfg.OUTPUT_DIR, model, optimizer, cur_epoch, cfg, scaler=scaler)
         # Evaluate the model on validation set.
         if misc.is_eval_epoch(cfg, cur_epoch):
             is_best_epoch = eval_epoch(val_loader, model, val_meter, cur_epoch, cfg)
             if is_best_epoch:
-                cu.save_checkpoint(cfg.OUTPUT_DIR, model, optimizer, cur_epoch, cfg, is_best_epoch=is_best_epoch)
+                cu.save_checkpoint(
+                    cfg.OUTPUT_DIR, model, optimizer, cur_epoch, cfg, is_best_epoch=is_best_epoch, scaler=scaler
+                )
 